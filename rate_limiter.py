@@ -0,0 +1,74 @@
+import threading
+import time
+from collections import deque
+from typing import Optional
+
+
+class RateLimiter:
+    """Bound concurrent and per-minute requests to the Azure deployment
+
+    Use as a context manager around each API call. The concurrency bound is
+    a semaphore; the optional requests-per-minute bound is a sliding window
+    over the start times of the last minute's requests. hold_off() pauses
+    new requests when the server signals it is throttling.
+    """
+
+    def __init__(self, max_concurrent: int, max_per_minute: Optional[int] = None):
+        """Initialize the limiter"""
+        self.max_per_minute = max_per_minute
+        self._slots = threading.BoundedSemaphore(max_concurrent)
+        self._started = deque()
+        self._resume_at = 0.0
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        while True:
+            # Wait out a hold-off before taking a slot, so pausing never holds one
+            self._wait_for_resume()
+            self._slots.acquire()
+            with self._lock:
+                if time.monotonic() >= self._resume_at:
+                    break
+            # A hold-off started while waiting for the slot
+            self._slots.release()
+
+        try:
+            self._wait_for_window()
+        except BaseException:
+            self._slots.release()
+            raise
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._slots.release()
+
+    def hold_off(self, seconds: float):
+        """Keep new requests from starting for the next seconds"""
+        with self._lock:
+            self._resume_at = max(self._resume_at, time.monotonic() + seconds)
+
+    def _wait_for_resume(self):
+        while True:
+            with self._lock:
+                delay = self._resume_at - time.monotonic()
+            if delay <= 0:
+                return
+            time.sleep(delay)
+
+    def _wait_for_window(self):
+        if not self.max_per_minute:
+            return
+
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                while self._started and now - self._started[0] >= 60:
+                    self._started.popleft()
+
+                if len(self._started) < self.max_per_minute:
+                    self._started.append(now)
+                    return
+
+                delay = 60 - (now - self._started[0])
+
+            time.sleep(delay)
@@ -1,136 +1,96 @@
 import streamlit as st
-import requests
-import base64
-import re
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from typing import List
-import io
+from typing import List, Optional, Tuple
 import os
 from dotenv import load_dotenv
+from tts_client import COMBINABLE_FORMATS, DEFAULT_CONVERT_TIMEOUT, MIME_TYPES, AzureTTSClient
 
 # Load environment variables from .env file for  
 load_dotenv()
 
-class AzureTTSClient:
-    def __init__(self, endpoint: str, api_key: str):
-        """Initialize the Azure TTS client"""
-        self.endpoint = endpoint
-        self.api_key = api_key
-        self.headers = {
-            "Content-Type": "application/json",
-            "Authorization": f"Bearer {api_key}"
-        }
-        
-    def chunk_text(self, text: str, max_chars: int = 6000) -> List[str]:
-        """Split text into chunks that respect sentence boundaries
-        
-        GPT-4o mini TTS has a limit of 2000 tokens per request.
-        Using ~6000 characters provides a safe margin since tokens are 
-        roughly 3-4 characters each (2000 tokens ≈ 6000-8000 chars).
-        We use 6000 characters to stay safely within the token limit.
-        """
-        if len(text) <= max_chars:
-            return [text]
-        
-        chunks = []
-        current_chunk = ""
-        
-        # Split by sentences first
-        sentences = re.split(r'(?<=[.!?])\s+', text)
-        
-        for sentence in sentences:
-            # If a single sentence is too long, split by words
-            if len(sentence) > max_chars:
-                words = sentence.split()
-                temp_chunk = ""
-                
-                for word in words:
-                    if len(temp_chunk + " " + word) <= max_chars:
-                        temp_chunk += (" " + word) if temp_chunk else word
-                    else:
-                        if temp_chunk:
-                            chunks.append(temp_chunk.strip())
-                        temp_chunk = word
-                
-                if temp_chunk:
-                    if len(current_chunk + " " + temp_chunk) <= max_chars:
-                        current_chunk += (" " + temp_chunk) if current_chunk else temp_chunk
-                    else:
-                        if current_chunk:
-                            chunks.append(current_chunk.strip())
-                        current_chunk = temp_chunk
-            else:
-                # Check if adding this sentence exceeds the limit
-                if len(current_chunk + " " + sentence) <= max_chars:
-                    current_chunk += (" " + sentence) if current_chunk else sentence
-                else:
-                    if current_chunk:
-                        chunks.append(current_chunk.strip())
-                    current_chunk = sentence
-        
-        if current_chunk:
-            chunks.append(current_chunk.strip())
-        
-        return chunks
+# Upper bound on progress bar updates per conversion
+PROGRESS_STEPS = 10
+
+class StreamlitTTSClient(AzureTTSClient):
+    """AzureTTSClient that reports conversion progress in the Streamlit page"""
     
-    def text_to_speech(self, text: str, voice: str = "alloy") -> bytes:
-        """Convert text to speech using Azure OpenAI TTS API"""
-        payload = {
-            "model": "gpt-4o-mini-tts",
-            "input": text,
-            "voice": voice
-        }
+    def convert_and_combine(self, text: str, voice: str = "alloy", max_workers: Optional[int] = None,
+                            audio_format: str = "mp3") -> Tuple[bytes, str, List[int]]:
+        """Convert text to speech and return combined audio data as bytes, with its format
+        
+        Unlike convert_text_to_audio_data, which returns the parts, this
+        reports progress in the page and joins the parts into one file.
+        Formats that can't be joined into one playable file are sent as a
+        single request, falling back to MP3 only for text too long for one.
+        Also returns the numbers of any parts that failed and are missing
+        from the audio.
+        """
+        max_workers = max_workers or self.max_workers
+        if audio_format not in COMBINABLE_FORMATS:
+            # Parts can't be joined, so only split where the request limit forces it
+            chunks = self.chunk_text(text)
+            if len(chunks) > 1:
+                st.warning(f"⚠️ {audio_format.upper()} can't be combined across parts, so this longer text is generated as MP3")
+                audio_format = "mp3"
+                chunks = self.chunk_text(text, target_chunks=max_workers * 2, short_lead=True)
+        else:
+            # A short first part lets the preview player start early
+            chunks = self.chunk_text(text, target_chunks=max_workers * 2, short_lead=True)
+        if not chunks:
+            raise Exception("Please provide text to convert")
         
-        try:
-            response = requests.post(
-                self.endpoint,
-                headers=self.headers,
-                json=payload,
-                timeout=30
-            )
-            response.raise_for_status()
-            return response.content
-        except requests.exceptions.RequestException as e:
-            raise Exception(f"TTS API request failed: {str(e)}")
-    
-    def convert_text_to_audio_data(self, text: str, voice: str = "alloy", max_workers: int = 3) -> bytes:
-        """Convert text to speech and return combined audio data as bytes"""
-        chunks = self.chunk_text(text)
+        # A single request needs no executor, progress bar or combining
+        if len(chunks) == 1:
+            return self.text_to_speech(chunks[0], voice, audio_format), audio_format, []
         
-        if len(chunks) > 1:
-            st.info(f"Processing text in {len(chunks)} parts for optimal quality...")
+        st.info(f"Processing text in {len(chunks)} parts for optimal quality...")
         
         # Create progress bar
         progress_bar = st.progress(0)
         completed_chunks = 0
-        
-        # Submit all chunks for processing in parallel
-        with ThreadPoolExecutor(max_workers=max_workers) as executor:
-            # Submit all chunks
-            future_to_index = {
-                executor.submit(self.text_to_speech, chunk, voice): i 
-                for i, chunk in enumerate(chunks)
-            }
-            
-            # Collect results in order
-            results = [None] * len(chunks)
-            
-            for future in as_completed(future_to_index):
-                index = future_to_index[future]
-                try:
-                    audio_data = future.result()
+        # Each widget update is a websocket message, so the bar moves in
+        # at most PROGRESS_STEPS ticks and completions are listed once at the end
+        last_step = 0
+        completed_msgs = []
+        
+        # Holds a player for the first part while the remaining parts generate
+        preview_slot = st.empty()
+        
+        # Collect results in order; repeated chunks fill several slots at once
+        results = [None] * len(chunks)
+        missing_parts = []
+        
+        for indices, audio_data, error in self.synthesize_in_order(
+                chunks, voice, max_workers, audio_format, timeout=DEFAULT_CONVERT_TIMEOUT):
+            for index in indices:
+                if error is None:
                     results[index] = audio_data
                     completed_chunks += 1
-                    progress_bar.progress(completed_chunks / len(chunks))
-                    st.write(f"✅ Part {index + 1}/{len(chunks)} completed")
-                except Exception as e:
-                    st.error(f"❌ Error processing part {index + 1}: {e}")
-                    results[index] = None
+                    completed_msgs.append(f"✅ Part {index + 1}/{len(chunks)} completed")
+                else:
+                    missing_parts.append(index + 1)
+                    st.error(f"❌ Error processing part {index + 1}: {error}")
+            
+            # Results arrive in chunk order, so part 1 is playable before the rest finish
+            if indices[0] == 0 and error is None:
+                with preview_slot.container():
+                    st.caption("🎧 Part 1 is ready - listen while the rest is generated")
+                    st.audio(audio_data, format=MIME_TYPES[audio_format])
+            
+            step = completed_chunks * PROGRESS_STEPS // len(chunks)
+            if step > last_step:
+                progress_bar.progress(step / PROGRESS_STEPS)
+                last_step = step
         
         progress_bar.empty()
+        preview_slot.empty()
+        if completed_msgs:
+            st.markdown("  \n".join(completed_msgs))
         
-        # Filter out None results
-        audio_chunks = [audio for audio in results if audio is not None]
+        # Every slot is filled unless a part failed
+        if missing_parts:
+            audio_chunks = [audio for audio in results if audio is not None]
+        else:
+            audio_chunks = results
         
         if not audio_chunks:
             raise Exception("No audio chunks were successfully generated")
@@ -138,24 +98,107 @@ class AzureTTSClient:
         # Combine all chunks into a single audio file
         if len(audio_chunks) > 1:
             st.info("Combining audio parts into seamless speech...")
-            combined_audio = self.combine_audio_chunks(audio_chunks)
+            combined_audio = self.combine_audio_chunks(audio_chunks, audio_format)
         else:
             combined_audio = audio_chunks[0]
         
-        return combined_audio
+        return combined_audio, audio_format, sorted(missing_parts)
+
+@st.cache_resource(show_spinner=False)
+def get_tts_client(endpoint: str, api_key: str) -> StreamlitTTSClient:
+    """Return the process-wide TTS client for these credentials
     
-    def combine_audio_chunks(self, audio_chunks: List[bytes]) -> bytes:
-        """Combine multiple audio chunks into a single seamless audio file"""
-        if not audio_chunks:
-            return b""
+    Cached across reruns and sessions, so the pooled session, its warm
+    connections and the rate limiter live as long as the Streamlit server.
+    """
+    return StreamlitTTSClient(endpoint, api_key)
+
+@st.fragment
+def render_audio_panel(selected_voice: str, auto_play: bool, voice_options: dict):
+    """Render the audio player column
+    
+    As a fragment, it reruns on its own when its widgets change, instead of
+    rerunning the whole script and re-sending the audio with the rest of the page.
+    """
+    st.header("Audio Player")
+    
+    if 'combined_audio' in st.session_state and st.session_state.combined_audio:
+        combined_audio = st.session_state.combined_audio
+        # The sidebar may have changed since conversion; label the audio as generated
+        generated_format = st.session_state.get('combined_audio_format', 'mp3')
+        
+        # Audio info panel
+        with st.container():
+            col_info1, col_info2 = st.columns(2)
+            with col_info1:
+                audio_size_mb = len(combined_audio) / (1024 * 1024)
+                st.metric("📊 Audio Size", f"{audio_size_mb:.2f} MB")
+            with col_info2:
+                st.metric("🎵 Voice", voice_options.get(selected_voice, selected_voice).split(' - ')[0])
+        
+        st.markdown("**🎵 Your Audio is Ready!**")
+        
+        # Main audio player
+        st.audio(
+            combined_audio, 
+            format=MIME_TYPES[generated_format],
+            start_time=0,
+            autoplay=auto_play,
+            loop=False
+        )
+        
+        # Additional audio information
+        show_audio_info = st.checkbox("📊 Show detailed audio info", help="Display technical audio information")
         
-        if len(audio_chunks) == 1:
-            return audio_chunks[0]
+        if show_audio_info:
+            audio_size_kb = len(combined_audio) / 1024
+            st.info(f"📊 Format: {generated_format.upper()} | Voice: {selected_voice} | Size: {audio_size_kb:.1f} KB")
         
-        # For MP3 files, we can simply concatenate the bytes
-        # This works because MP3 is designed to be streamable
-        combined_audio = b"".join(audio_chunks)
-        return combined_audio
+        # Download section
+        st.markdown("---")
+        st.markdown("**💾 Download Audio**")
+        
+        col_download1, col_download2 = st.columns(2)
+        
+        with col_download1:
+            st.download_button(
+                label="⬇️ Download Audio",
+                data=combined_audio,
+                file_name=f"podcast_{selected_voice}.{generated_format}",
+                mime=MIME_TYPES[generated_format],
+                use_container_width=True,
+                help="Download the complete audio file"
+            )
+        
+        with col_download2:
+            audio_size_mb = len(combined_audio) / (1024 * 1024)
+            st.write(f"📋 File size: {audio_size_mb:.2f} MB")
+        
+        # Playback tips
+        with st.expander("� Playback Tips", expanded=False):
+            st.markdown("""
+            **🎵 Audio Playback:**
+            - Use your browser's built-in controls for play/pause/seek
+            - Right-click the audio player for additional options
+            - The audio will play continuously without interruption
+            - Compatible with all modern browsers and mobile devices
+            
+            **💾 Download Options:**
+            - Click "Download Audio" to save the file locally
+            - The downloaded file works with any audio player
+            - Perfect for offline listening or sharing
+            """)
+    else:
+        st.info("👆 Convert some text to see the audio player")
+        st.markdown("""
+        **🎵 Audio Player Features:**
+        - 🎤 6 different voice styles to choose from
+        - 🎵 Seamless audio playback without interruptions
+        - 📊 Multiple audio format support (MP3, WAV, OGG)
+        - 💾 Easy download for offline listening
+        - � Mobile-optimized player controls
+        - 🔊 Optional auto-play functionality
+        """)
 
 def main():
     st.set_page_config(
@@ -215,6 +258,11 @@ def main():
         if endpoint and api_key:
             st.success("🔗 Azure TTS Connected")
             st.caption("Using configured secrets")
+            
+            # Handshake with Azure once per session, before the first conversion
+            if 'tls_warmed' not in st.session_state:
+                st.session_state.tls_warmed = True
+                get_tts_client(endpoint, api_key).warm_up()
         else:
             st.error("❌ Missing Azure TTS Configuration")
             st.caption("Check your secrets.toml or .env file")
@@ -287,103 +335,33 @@ def main():
             try:
                 # Initialize TTS client
                 with st.spinner("Initializing TTS client..."):
-                    tts_client = AzureTTSClient(endpoint, api_key)
+                    tts_client = get_tts_client(endpoint, api_key)
 
                 # Convert text to audio
                 with st.spinner("Converting text to speech..."):
-                    combined_audio = tts_client.convert_text_to_audio_data(text_input.strip(), selected_voice)
+                    combined_audio, generated_format, missing_parts = tts_client.convert_and_combine(
+                        text_input.strip(), selected_voice, audio_format=audio_format
+                    )
 
                 if not combined_audio:
                     st.error("Failed to generate audio")
                     return
 
-                st.success("✅ Audio conversion completed!")
+                if missing_parts:
+                    parts = ", ".join(map(str, missing_parts))
+                    st.warning(f"⚠️ Audio converted with gaps: part(s) {parts} failed and are missing")
+                else:
+                    st.success("✅ Audio conversion completed!")
 
-                # Store combined audio in session state
+                # Store combined audio in session state, with the format it was generated in
                 st.session_state.combined_audio = combined_audio
+                st.session_state.combined_audio_format = generated_format
 
             except Exception as e:
                 st.error(f"❌ TTS conversion failed: {str(e)}")
     
     with col2:
-        st.header("Audio Player")
-        
-        if 'combined_audio' in st.session_state and st.session_state.combined_audio:
-            combined_audio = st.session_state.combined_audio
-            
-            # Audio info panel
-            with st.container():
-                col_info1, col_info2 = st.columns(2)
-                with col_info1:
-                    audio_size_mb = len(combined_audio) / (1024 * 1024)
-                    st.metric("📊 Audio Size", f"{audio_size_mb:.2f} MB")
-                with col_info2:
-                    st.metric("🎵 Voice", voice_options.get(selected_voice, selected_voice).split(' - ')[0])
-            
-            st.markdown("**🎵 Your Audio is Ready!**")
-            
-            # Main audio player
-            st.audio(
-                combined_audio, 
-                format=f'audio/{audio_format}',
-                start_time=0,
-                autoplay=auto_play,
-                loop=False
-            )
-            
-            # Additional audio information
-            show_audio_info = st.checkbox("📊 Show detailed audio info", help="Display technical audio information")
-            
-            if show_audio_info:
-                st.info(f"📊 Format: {audio_format.upper()} | Voice: {selected_voice} | Size: {audio_size_kb:.1f} KB")
-            
-            # Download section
-            st.markdown("---")
-            st.markdown("**💾 Download Audio**")
-            
-            col_download1, col_download2 = st.columns(2)
-            
-            with col_download1:
-                st.download_button(
-                    label="⬇️ Download Audio",
-                    data=combined_audio,
-                    file_name=f"podcast_{selected_voice}.{audio_format}",
-                    mime=f"audio/{audio_format}",
-                    use_container_width=True,
-                    help="Download the complete audio file"
-                )
-            
-            with col_download2:
-                # Create a base64 encoded version for sharing
-                audio_b64 = base64.b64encode(combined_audio).decode()
-                audio_size_mb = len(combined_audio) / (1024 * 1024)
-                st.write(f"📋 File size: {audio_size_mb:.2f} MB")
-            
-            # Playback tips
-            with st.expander("� Playback Tips", expanded=False):
-                st.markdown("""
-                **🎵 Audio Playback:**
-                - Use your browser's built-in controls for play/pause/seek
-                - Right-click the audio player for additional options
-                - The audio will play continuously without interruption
-                - Compatible with all modern browsers and mobile devices
-                
-                **💾 Download Options:**
-                - Click "Download Audio" to save the file locally
-                - The downloaded file works with any audio player
-                - Perfect for offline listening or sharing
-                """)
-        else:
-            st.info("👆 Convert some text to see the audio player")
-            st.markdown("""
-            **🎵 Audio Player Features:**
-            - 🎤 6 different voice styles to choose from
-            - 🎵 Seamless audio playback without interruptions
-            - 📊 Multiple audio format support (MP3, WAV, OGG)
-            - 💾 Easy download for offline listening
-            - � Mobile-optimized player controls
-            - 🔊 Optional auto-play functionality
-            """)
+        render_audio_panel(selected_voice, auto_play, voice_options)
     
     # Instructions section
     with st.expander("📖 How to Use This App", expanded=False):
@@ -0,0 +1,32 @@
+import threading
+import time
+
+from tts_client import AzureTTSClient
+
+
+def test_close_mid_conversion_fails_remaining_chunks():
+    """Chunks not yet submitted when close() runs are reported at once, not waited for"""
+    client = AzureTTSClient("https://example.invalid", "key", max_workers=2, max_rpm=None)
+    started = threading.Event()
+    
+    def fake_tts(text, voice, audio_format="mp3"):
+        started.set()
+        time.sleep(0.2)
+        return text.encode()
+    
+    client.text_to_speech = fake_tts
+    chunks = [f"Chunk {i}." for i in range(8)]
+    results = []
+    
+    def run():
+        results.extend(client.synthesize_chunks(chunks, timeout=None))
+    
+    worker = threading.Thread(target=run, daemon=True)
+    worker.start()
+    assert started.wait(1)
+    client.close()
+    worker.join(5)
+    
+    assert not worker.is_alive(), "synthesize_chunks hung after close()"
+    assert sorted(i for indices, _, _ in results for i in indices) == list(range(len(chunks)))
+    assert any(error is not None for _, _, error in results)
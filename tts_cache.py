@@ -0,0 +1,149 @@
+import hashlib
+import os
+import re
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+try:
+    # Optional SIMD-accelerated hash for cache keys
+    from blake3 import blake3 as _key_hash
+except ImportError:
+    _key_hash = hashlib.sha256
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "azure-tts")
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024  # 256 MB
+
+# Names of the entry files the cache writes: a hex digest of the key plus ".audio"
+_ENTRY_NAME_RE = re.compile(r"[0-9a-f]{64}\.audio")
+
+
+class TTSCache:
+    """Content-addressed cache of synthesized audio
+
+    Entries live in an in-memory LRU and are mirrored to a directory on disk,
+    so repeated (endpoint, model, format, voice, text) requests skip the API
+    even across restarts.
+    Both layers are capped by total bytes and evict least recently used first.
+    """
+
+    def __init__(self, directory: Optional[str] = None, max_bytes: int = DEFAULT_MAX_BYTES):
+        """Initialize the cache, creating the cache directory if needed"""
+        self.directory = directory or os.getenv("AZURE_TTS_CACHE_DIR", DEFAULT_CACHE_DIR)
+        self.max_bytes = max_bytes
+        self._memory = OrderedDict()
+        self._memory_bytes = 0
+        self._lock = threading.Lock()
+
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+        except OSError:
+            # Read-only or unavailable filesystem: fall back to memory only
+            self.directory = None
+
+    @staticmethod
+    def make_key(endpoint: str, model: str, voice: str, text: str, audio_format: str = "mp3") -> str:
+        """Build the cache key for a synthesis request
+        
+        The endpoint is part of the key because different Azure deployments
+        may serve different audio for the same model name. API keys are not.
+        Hashed with BLAKE3 when installed, SHA-256 otherwise.
+        """
+        return _key_hash(f"{endpoint}|{model}|{audio_format}|{voice}|{text}".encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.audio")
+
+    def get(self, key: str) -> Optional[bytes]:
+        """Return cached audio for key, or None on a miss"""
+        with self._lock:
+            data = self._memory.get(key)
+            if data is not None:
+                self._memory.move_to_end(key)
+                return data
+
+        if not self.directory:
+            return None
+
+        try:
+            with open(self._path(key), "rb") as f:
+                data = f.read()
+            # Touch the file so disk eviction stays least-recently-used
+            os.utime(self._path(key))
+        except OSError:
+            return None
+
+        self._remember(key, data)
+        return data
+
+    def put(self, key: str, data: bytes):
+        """Store audio for key in memory and on disk"""
+        self._remember(key, data)
+
+        if not self.directory:
+            return
+
+        # Write to a temp file and rename, so readers never see partial audio
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        except OSError:
+            return
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, self._path(key))
+        except OSError:
+            # Don't leave the partial file behind; nothing else would remove it
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            return
+
+        self._prune_disk()
+
+    def _remember(self, key: str, data: bytes):
+        if len(data) > self.max_bytes:
+            return
+
+        with self._lock:
+            previous = self._memory.pop(key, None)
+            if previous is not None:
+                self._memory_bytes -= len(previous)
+            self._memory[key] = data
+            self._memory_bytes += len(data)
+
+            while self._memory_bytes > self.max_bytes:
+                _, evicted = self._memory.popitem(last=False)
+                self._memory_bytes -= len(evicted)
+
+    def _prune_disk(self):
+        # Only ever delete the cache's own entries; the directory is user-configurable
+        try:
+            entries = [
+                entry for entry in os.scandir(self.directory)
+                if _ENTRY_NAME_RE.fullmatch(entry.name) and entry.is_file()
+            ]
+        except OSError:
+            return
+
+        stats = []
+        for entry in entries:
+            try:
+                info = entry.stat()
+            except OSError:
+                continue
+            stats.append((info.st_mtime, info.st_size, entry.path))
+        total = sum(size for _, size, _ in stats)
+        if total <= self.max_bytes:
+            return
+
+        for _, size, path in sorted(stats):
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            if total <= self.max_bytes:
+                break
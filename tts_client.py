@@ -0,0 +1,684 @@
+import functools
+import io
+import json
+import logging
+import math
+import queue
+import re
+import threading
+import time
+import wave
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+import os
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from dotenv import load_dotenv
+from rate_limiter import RateLimiter
+from tts_cache import TTSCache
+
+try:
+    # Optional C-accelerated JSON encoder for request payloads
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    # Optional linear-time regex engine (google-re2) for sentence splitting
+    import re2 as _regex
+except ImportError:
+    _regex = re
+
+try:
+    # Optional native sentence splitter; knows abbreviations like "Mr." and "e.g."
+    import blingfire
+except ImportError:
+    blingfire = None
+
+try:
+    # Optional tokenizer for packing chunks by the model's real token count
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+# Load environment variables from .env file before reading the settings below
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+TTS_MODEL = "gpt-4o-mini-tts"
+
+# Concurrency and request-rate caps; size these to the Azure deployment's RPM quota
+DEFAULT_MAX_WORKERS = int(os.getenv("AZURE_TTS_MAX_WORKERS", "3"))
+DEFAULT_MAX_RPM = int(os.getenv("AZURE_TTS_MAX_RPM", "0")) or None
+
+# Overall deadline in seconds for a multi-part conversion; parts still pending
+# then are given up on, so one straggler can't hold the rest hostage. On top of
+# REQUEST_TIMEOUT, which bounds each read but not a request's total time. Off by
+# default: it counts time queued behind other conversions, and a full chunk can
+# take minutes, so any fixed value would drop parts of ordinary long texts.
+DEFAULT_CONVERT_TIMEOUT = float(os.getenv("AZURE_TTS_CONVERT_TIMEOUT", "0")) or None
+
+# Output formats offered by the apps, mapped to the API's response_format.
+# Ogg is requested as Opus, which the API returns in an Ogg container.
+RESPONSE_FORMATS = {"mp3": "mp3", "wav": "wav", "ogg": "opus"}
+MIME_TYPES = {"mp3": "audio/mpeg", "wav": "audio/wav", "ogg": "audio/ogg"}
+
+# Formats whose parts join into one file that players play to the end. Joined
+# Ogg parts form a chained stream, which browsers stop playing after part 1.
+COMBINABLE_FORMATS = ("mp3", "wav")
+
+# (connect, read) seconds: fail fast on an unreachable host, but give synthesis time
+REQUEST_TIMEOUT = (3, 30)
+
+# Responses worth another attempt, how many attempts a chunk gets in all,
+# and the base of the exponential backoff between them in seconds
+RETRY_STATUSES = frozenset([429, 500, 502, 503, 504])
+MAX_ATTEMPTS = 4
+RETRY_BACKOFF = 0.2
+
+# Pause in seconds when the deployment throttles without saying for how long,
+# and the longest pause a Retry-After header may impose on the whole client
+DEFAULT_HOLD_OFF = 1.0
+MAX_HOLD_OFF = 60.0
+
+# Smallest chunk size worth a separate request when splitting for parallelism
+MIN_CHUNK_CHARS = 500
+
+# Token budget per chunk when tiktoken is available: under the model's 2000
+# token input limit, with room for the request's own framing
+MAX_CHUNK_TOKENS = 1900
+MIN_CHUNK_TOKENS = 125
+TOKEN_ENCODING = "o200k_base"
+
+# Sentence terminators, including the full-width ones CJK text uses
+_SENTENCE_TERMINATORS = ".!?\u3002\uff01\uff1f"
+
+# Sentence boundary: ASCII terminal punctuation followed by whitespace, or a
+# full-width terminator, which CJK text doesn't follow with a space. Written
+# without lookbehind so the optional DFA-based re2 engine can compile it.
+# Whitespace is spelled out (the set Python's \s matches) since re2's \s is
+# ASCII-only; the pattern is a plain string so both engines see real chars.
+_WHITESPACE = "[\t\n\v\f\r\x1c-\x20\x85\xa0\u1680\u2000-\u200a\u2028\u2029\u202f\u205f\u3000]"
+_SENT_RE = _regex.compile("[.!?]" + _WHITESPACE + "+|[\u3002\uff01\uff1f]" + _WHITESPACE + "*")
+
+# Line breaks and tabs become spaces; other control characters are dropped
+_CONTROL_TABLE = str.maketrans(
+    {**{chr(i): None for i in range(32)}, "\x7f": None, **{c: " " for c in "\t\n\r\v\f"}}
+)
+_SPACES_RE = _regex.compile(r' {2,}')
+
+def _normalize_text(text: str) -> str:
+    """Flatten whitespace and drop control characters in one translate pass
+    
+    Pasted text often carries hard-wrapped lines, tabs and stray control
+    bytes; flattening them keeps sentence detection from seeing breaks that
+    aren't there, and keeps equal text hashing to the same cache entries.
+    """
+    return _SPACES_RE.sub(" ", text.translate(_CONTROL_TABLE)).strip()
+
+def _iter_sentences(text: str) -> Iterator[str]:
+    """Yield sentences by slicing between boundary matches
+    
+    Like re.split(r'(?<=[.!?])\s+', text), plus splits after full-width
+    terminators, but never holds the full list of sentences, so very large
+    inputs are walked once with one slice each.
+    
+    With blingfire installed, its splitter is used instead, so chunks don't
+    break after abbreviations.
+    """
+    if blingfire is not None:
+        yield from blingfire.text_to_sentences(text).split("\n")
+        return
+    
+    start = 0
+    for match in _SENT_RE.finditer(text):
+        # Keep the punctuation with its sentence, drop the whitespace
+        yield text[start:match.start() + 1]
+        start = match.end()
+    yield text[start:]
+
+def _utf8_len(text: str) -> int:
+    """Length of text in UTF-8 bytes"""
+    return len(text.encode("utf-8"))
+
+@functools.lru_cache(maxsize=None)
+def _token_len_func() -> Optional[Callable[[str], int]]:
+    """Return a function counting tokens in text, or None without tiktoken
+    
+    Loaded once, normally by AzureTTSClient.warm_up, since tiktoken downloads
+    encodings it hasn't cached. A failure to load (e.g. offline) falls back to
+    character sizing.
+    """
+    if tiktoken is None:
+        return None
+    try:
+        encoding = tiktoken.get_encoding(TOKEN_ENCODING)
+    except Exception as e:
+        logger.warning("Falling back to character-based chunking: %s", e)
+        return None
+    return lambda text: len(encoding.encode_ordinary(text))
+
+def _fits(sizes: Tuple[int, ...], limits: Tuple[int, ...]) -> bool:
+    """Whether every size is within its limit"""
+    return all(size <= limit for size, limit in zip(sizes, limits))
+
+def _dumps(payload: dict) -> bytes:
+    """Serialize a request payload to JSON bytes"""
+    if orjson is not None:
+        return orjson.dumps(payload)
+    return json.dumps(payload).encode("utf-8")
+
+# Shared by every client in the process, so cached audio outlives a client
+_CACHE = TTSCache()
+
+class ConversionTimeoutError(Exception):
+    """Reported for chunks still pending when a conversion's deadline passes"""
+
+class AzureTTSClient:
+    def __init__(self, endpoint: str, api_key: str, max_workers: Optional[int] = None,
+                 max_rpm: Optional[int] = DEFAULT_MAX_RPM, cache: Optional[TTSCache] = None):
+        """Initialize the Azure TTS client"""
+        max_workers = max_workers or DEFAULT_MAX_WORKERS
+        self.endpoint = endpoint
+        self.api_key = api_key
+        self.max_workers = max_workers
+        self.cache = cache or _CACHE
+        # Shared by all conversions on this client, so concurrent users can't exceed the caps together
+        self.limiter = RateLimiter(max_workers, max_rpm)
+        self.headers = {
+            "Content-Type": "application/json",
+            "Authorization": f"Bearer {api_key}"
+        }
+        
+        # One pooled session for all chunks, so parallel and sequential
+        # requests to the same Azure host reuse their TCP/TLS connections
+        self.session = requests.Session()
+        self.session.headers.update(self.headers)
+        # Only failed connects are retried here: they never reach the API. Retries
+        # of sent requests happen in stream_speech, through the rate limiter.
+        retries = Retry(
+            total=3,
+            read=0,
+            backoff_factor=0.2
+        )
+        adapter = HTTPAdapter(
+            pool_connections=max_workers,
+            pool_maxsize=max_workers,
+            max_retries=retries
+        )
+        self.session.mount("https://", adapter)
+        
+        # Worker pool shared by all conversions on this client, created on first use
+        self._executor = None
+        self._executor_lock = threading.Lock()
+        self._closed = False
+    
+    def warm_up(self):
+        """Open a pooled connection to the endpoint in the background
+        
+        Sends a cheap HEAD request so the TCP/TLS handshake happens while the
+        user is still typing, and the first chunk reuses the open connection.
+        The response status is irrelevant and failures are ignored. The
+        tiktoken encoding, if installed, is loaded in the same thread.
+        """
+        def connect():
+            try:
+                self.session.head(self.endpoint, timeout=5).close()
+            except requests.exceptions.RequestException:
+                pass
+            # Load (and if needed download) the tokenizer before the first chunking
+            _token_len_func()
+        
+        threading.Thread(target=connect, name="azure-tts-warm-up", daemon=True).start()
+    
+    def _get_executor(self) -> ThreadPoolExecutor:
+        """Return the client's worker pool, creating it on first use
+        
+        Reusing one pool keeps idle threads alive between conversions instead
+        of starting and joining a fresh set every call. It is sized to the
+        client's max_workers, the same cap the limiter puts on requests.
+        Raises once the client is closed, rather than quietly starting a new pool.
+        """
+        with self._executor_lock:
+            if self._closed:
+                raise Exception("TTS client is closed")
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers,
+                    thread_name_prefix="azure-tts"
+                )
+            return self._executor
+    
+    def close(self):
+        """Close the pooled HTTP session and release the worker pool"""
+        with self._executor_lock:
+            executor, self._executor = self._executor, None
+            self._closed = True
+        if executor is not None:
+            # Don't block on in-flight conversions; they finish on their own
+            executor.shutdown(wait=False)
+        self.session.close()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        
+    def chunk_text(self, text: str, max_chars: int = 6000, target_chunks: Optional[int] = None,
+                   max_tokens: int = MAX_CHUNK_TOKENS, short_lead: bool = False) -> List[str]:
+        """Split text into chunks that respect sentence boundaries
+        
+        GPT-4o mini TTS has a limit of 2000 tokens per request.
+        Using ~6000 characters provides a safe margin since tokens are 
+        roughly 3-4 characters each (2000 tokens ≈ 6000-8000 chars).
+        We use 6000 characters to stay safely within the token limit.
+        
+        Sizes are measured in UTF-8 bytes, which equals characters for ASCII
+        text. Scripts such as CJK use more tokens per character, and their
+        3-byte encoding keeps those chunks proportionally smaller.
+        
+        With tiktoken installed, each chunk is also kept within max_tokens, which
+        guards text that tokenizes densely (numbers, code, rare scripts) where
+        the character estimate alone could overrun the API limit.
+        
+        If target_chunks is given, chunks shrink (down to MIN_CHUNK_CHARS,
+        or MIN_CHUNK_TOKENS) so the text splits into about that many parts,
+        keeping the slowest request short and giving every worker something to do.
+        
+        If short_lead is set, the first chunk is packed only up to the minimum
+        size, so the opening part's audio comes back well before the others.
+        
+        Returns an empty list if nothing is left to speak once the text is
+        normalized (e.g. it held only control characters).
+        """
+        text = _normalize_text(text)
+        if not text:
+            return []
+        
+        # Skip per-piece encoding for ASCII, where bytes and characters agree
+        byte_len = len if text.isascii() else _utf8_len
+        token_len = _token_len_func()
+        if token_len is not None:
+            # Tokens are the API's real limit, but max_chars still caps each chunk
+            measure = lambda s: (byte_len(s), token_len(s))
+            max_sizes, min_sizes = (max_chars, max_tokens), (MIN_CHUNK_CHARS, MIN_CHUNK_TOKENS)
+        else:
+            measure = lambda s: (byte_len(s),)
+            max_sizes, min_sizes = (max_chars,), (MIN_CHUNK_CHARS,)
+        text_sizes = measure(text)
+        
+        if target_chunks:
+            max_sizes = tuple(
+                max(low, min(high, math.ceil(size / target_chunks)))
+                for size, low, high in zip(text_sizes, min_sizes, max_sizes)
+            )
+        
+        if _fits(text_sizes, max_sizes):
+            return [text]
+        
+        lead_sizes = tuple(map(min, min_sizes, max_sizes)) if short_lead else None
+        
+        # Without sentence punctuation the regex has nothing to find; pack words
+        # directly. blingfire finds boundaries by more than punctuation, so it always runs.
+        if blingfire is None and not any(c in text for c in _SENTENCE_TERMINATORS):
+            words = ((word, measure(word)) for word in text.split())
+            return list(self._pack(words, max_sizes, lead_sizes))
+        
+        def pieces():
+            # Sentences, each measured once, with any that is too long split by words
+            for sentence in _iter_sentences(text):
+                if not sentence:
+                    continue
+                sizes = measure(sentence)
+                if _fits(sizes, max_sizes):
+                    yield sentence, sizes
+                else:
+                    yield from self._split_words(sentence, max_sizes, measure)
+        
+        return list(self._pack(pieces(), max_sizes, lead_sizes))
+    
+    @staticmethod
+    def _split_words(sentence: str, limits: Tuple[int, ...],
+                     measure: Callable[[str], Tuple[int, ...]]) -> Iterator[Tuple[str, Tuple[int, ...]]]:
+        """Split an over-long sentence into runs of words within limits
+        
+        Yields (run, sizes) so the packer doesn't measure runs again. Only
+        offsets into the word list are tracked; each run is joined once from
+        a slice when it is emitted.
+        """
+        words = sentence.split()
+        start = 0
+        run_sizes = ()
+        
+        for i, word in enumerate(words):
+            word_sizes = measure(word)
+            if i > start:
+                needed = tuple(run + size + 1 for run, size in zip(run_sizes, word_sizes))
+                if _fits(needed, limits):
+                    run_sizes = needed
+                    continue
+                yield " ".join(words[start:i]), run_sizes
+            start = i
+            run_sizes = word_sizes
+        
+        if start < len(words):
+            yield " ".join(words[start:]), run_sizes
+    
+    @staticmethod
+    def _pack(pieces: Iterable[Tuple[str, Tuple[int, ...]]], limits: Tuple[int, ...],
+              first_limits: Optional[Tuple[int, ...]] = None) -> Iterator[str]:
+        """Greedily join measured pieces with spaces into strings within limits
+        
+        Each piece carries its sizes, one per limit (bytes, and tokens with
+        tiktoken). The joined sizes are tracked as integers and each group is
+        joined once, instead of growing a string and re-measuring it.
+        If first_limits is given, the first string is capped at those instead
+        (a single piece may still exceed them).
+        """
+        group = []
+        group_sizes = ()
+        current_limits = first_limits or limits
+        
+        for piece, sizes in pieces:
+            if group:
+                needed = tuple(joined + size + 1 for joined, size in zip(group_sizes, sizes))
+                if _fits(needed, current_limits):
+                    group.append(piece)
+                    group_sizes = needed
+                    continue
+                yield " ".join(group)
+                current_limits = limits
+            group = [piece]
+            group_sizes = sizes
+        
+        if group:
+            yield " ".join(group)
+    
+    def text_to_speech(self, text: str, voice: str = "alloy", audio_format: str = "mp3") -> bytes:
+        """Convert text to speech using Azure OpenAI TTS API"""
+        return b"".join(self.stream_speech(text, voice, audio_format))
+    
+    def stream_speech(self, text: str, voice: str = "alloy", audio_format: str = "mp3",
+                      block_size: int = 64 * 1024) -> Iterator[bytes]:
+        """Yield audio blocks as they download, so playback can start before the response completes"""
+        cache_key = TTSCache.make_key(self.endpoint, TTS_MODEL, voice, text, audio_format)
+        cached_audio = self.cache.get(cache_key)
+        if cached_audio is not None:
+            yield cached_audio
+            return
+        
+        payload = {
+            "model": TTS_MODEL,
+            "input": text,
+            "voice": voice,
+            "response_format": RESPONSE_FORMATS[audio_format]
+        }
+        
+        body = _dumps(payload)
+        audio = bytearray()
+        try:
+            for attempt in range(1, MAX_ATTEMPTS + 1):
+                # Every attempt passes the limiter, so retries count against the RPM cap
+                with self.limiter, self.session.post(
+                    self.endpoint,
+                    data=body,
+                    timeout=REQUEST_TIMEOUT,
+                    stream=True
+                ) as response:
+                    self._note_throttling(response)
+                    if response.status_code not in RETRY_STATUSES or attempt == MAX_ATTEMPTS:
+                        response.raise_for_status()
+                        for block in response.iter_content(block_size):
+                            audio += block
+                            yield block
+                        break
+                
+                logger.info("Retrying TTS request after HTTP %s (attempt %d)", response.status_code, attempt)
+                # A 429 already held off the limiter; back off from server errors here
+                if response.status_code != 429:
+                    time.sleep(RETRY_BACKOFF * 2 ** (attempt - 1))
+        except requests.exceptions.RequestException as e:
+            raise Exception(f"TTS API request failed: {str(e)}")
+        
+        # Only complete responses are cached
+        self.cache.put(cache_key, bytes(audio))
+    
+    def _note_throttling(self, response: requests.Response):
+        """Pause the client's new requests if the deployment is throttling
+        
+        A 429, or a success reporting no remaining requests, holds off every
+        worker for Retry-After seconds (at most MAX_HOLD_OFF) instead of letting
+        each one run into the limit on its own. Retry-After values that aren't
+        a number of seconds, such as the HTTP-date form, are ignored in favor
+        of DEFAULT_HOLD_OFF.
+        """
+        remaining = response.headers.get("x-ratelimit-remaining-requests")
+        if response.status_code != 429 and remaining != "0":
+            return
+        
+        delay = DEFAULT_HOLD_OFF
+        try:
+            retry_after = float(response.headers.get("Retry-After", ""))
+        except ValueError:
+            retry_after = None
+        if retry_after is not None and math.isfinite(retry_after) and retry_after >= 0:
+            delay = min(retry_after, MAX_HOLD_OFF)
+        logger.info("Azure deployment is throttling; pausing requests for %.1fs", delay)
+        self.limiter.hold_off(delay)
+    
+    @staticmethod
+    def _chunk_positions(chunks: List[str]) -> Dict[str, List[int]]:
+        """Map each unique chunk to every position it appears at, in first-seen order"""
+        positions = defaultdict(list)
+        for i, chunk in enumerate(chunks):
+            positions[chunk].append(i)
+        return positions
+    
+    def _safe_tts(self, text: str, voice: str, audio_format: str) -> Tuple[Optional[bytes], Optional[Exception]]:
+        """Run text_to_speech, returning (audio, None) or (None, error) instead of raising"""
+        try:
+            return self.text_to_speech(text, voice, audio_format), None
+        except Exception as e:
+            logger.warning("Error processing chunk: %s", e)
+            return None, e
+    
+    def synthesize_chunks(self, chunks: List[str], voice: str = "alloy", max_workers: Optional[int] = None,
+                          audio_format: str = "mp3", timeout: Optional[float] = None
+                          ) -> Iterator[Tuple[List[int], Optional[bytes], Optional[Exception]]]:
+        """Synthesize chunks in parallel, yielding results in completion order
+        
+        Each item is (indices, audio, error): the chunk positions the result
+        belongs to, and either the audio or the exception that failed it.
+        Identical chunks are synthesized once and reported for every position.
+        
+        At most max_workers of this call's requests are in flight at once
+        (the client's max_workers by default, which also sizes the shared
+        pool and caps this); the next chunk is submitted as each one finishes.
+        
+        If timeout is given, chunks not done that many seconds after the
+        call are reported with a ConversionTimeoutError instead of waited for.
+        """
+        positions = self._chunk_positions(chunks)
+        executor = self._get_executor()
+        workers = min(max_workers or self.max_workers, self.max_workers)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        
+        # Finished (chunk, audio, error) results, put by the workers' done callbacks
+        finished = queue.Queue()
+        unsubmitted = iter(list(positions))
+        submitted = []
+        lock = threading.Lock()
+        stopped = threading.Event()
+        
+        def submit_next():
+            with lock:
+                chunk = next(unsubmitted, None)
+                if chunk is None or stopped.is_set():
+                    return
+                try:
+                    future = executor.submit(self._safe_tts, chunk, voice, audio_format)
+                except Exception as e:
+                    # The pool was shut down by close() mid-conversion; no later
+                    # submit can succeed, so fail this chunk and every one after it
+                    finished.put((chunk, None, e))
+                    for chunk in unsubmitted:
+                        finished.put((chunk, None, e))
+                    return
+                submitted.append(future)
+            future.add_done_callback(lambda f: on_done(chunk, f))
+        
+        def on_done(chunk, future):
+            if future.cancelled():
+                return
+            finished.put((chunk, *future.result()))
+            submit_next()
+        
+        for _ in range(workers):
+            submit_next()
+        
+        reported = set()
+        try:
+            while len(reported) < len(positions):
+                remaining = None if deadline is None else max(0, deadline - time.monotonic())
+                try:
+                    chunk, audio_data, error = finished.get(timeout=remaining)
+                except queue.Empty:
+                    stopped.set()
+                    unreported = [chunk for chunk in positions if chunk not in reported]
+                    logger.warning("Giving up on %d chunk(s) after %ss", len(unreported), timeout)
+                    for chunk in unreported:
+                        # Requests already running finish in the background and still fill the cache
+                        error = ConversionTimeoutError(f"TTS conversion timed out after {timeout}s")
+                        yield positions[chunk], None, error
+                    return
+                
+                reported.add(chunk)
+                yield positions[chunk], audio_data, error
+        finally:
+            # The pool outlives this call, so drop queued work if the caller stops early
+            stopped.set()
+            with lock:
+                for future in submitted:
+                    future.cancel()
+    
+    def synthesize_in_order(self, chunks: List[str], voice: str = "alloy", max_workers: Optional[int] = None,
+                            audio_format: str = "mp3", timeout: Optional[float] = None
+                            ) -> Iterator[Tuple[List[int], Optional[bytes], Optional[Exception]]]:
+        """Like synthesize_chunks, but yield results in chunk order
+        
+        Requests still run concurrently, with the same max_workers window;
+        only the reporting follows input order. Suits callers that only use
+        the results once every chunk is done. Chunks that miss the timeout are
+        reported with a ConversionTimeoutError; later chunks that did finish
+        still count.
+        """
+        # Each unique chunk's rank in first-seen order, keyed by its first position
+        ranks = {indices[0]: rank for rank, indices in enumerate(self._chunk_positions(chunks).values())}
+        ready = {}
+        next_rank = 0
+        
+        for result in self.synthesize_chunks(chunks, voice, max_workers, audio_format, timeout):
+            ready[ranks[result[0][0]]] = result
+            while next_rank in ready:
+                yield ready.pop(next_rank)
+                next_rank += 1
+    
+    def iter_audio_results(self, text: str, voice: str = "alloy", max_workers: Optional[int] = None,
+                           audio_format: str = "mp3", timeout: Optional[float] = DEFAULT_CONVERT_TIMEOUT,
+                           short_lead: bool = False) -> Iterator[Tuple[Optional[bytes], Optional[Exception]]]:
+        """Yield (audio, error) for each chunk in order, as soon as it and every earlier chunk are done
+        
+        Chunks still pending when timeout runs out are reported with a
+        ConversionTimeoutError. short_lead (see chunk_text) suits callers that
+        play the first part as soon as it arrives; it costs an extra request.
+        """
+        max_workers = max_workers or self.max_workers
+        chunks = self.chunk_text(text, target_chunks=max_workers * 2, short_lead=short_lead)
+        if not chunks:
+            raise Exception("Please provide text to convert")
+        
+        # A single request needs no executor
+        if len(chunks) == 1:
+            yield self._safe_tts(chunks[0], voice, audio_format)
+            return
+        
+        # Finished chunks wait here until every chunk before them is done
+        ready = {}
+        next_index = 0
+        
+        for indices, audio_data, error in self.synthesize_chunks(chunks, voice, max_workers, audio_format, timeout):
+            for index in indices:
+                ready[index] = (audio_data, error)
+            
+            while next_index in ready:
+                yield ready.pop(next_index)
+                next_index += 1
+    
+    def iter_audio_chunks(self, text: str, voice: str = "alloy", max_workers: Optional[int] = None,
+                          audio_format: str = "mp3", timeout: Optional[float] = DEFAULT_CONVERT_TIMEOUT,
+                          short_lead: bool = False) -> Iterator[Optional[bytes]]:
+        """Yield each chunk's audio in order, as soon as it and every earlier chunk are done
+        
+        Failed chunks, and chunks still pending when timeout runs out,
+        yield None so callers keep their place in the sequence.
+        """
+        for audio_data, _ in self.iter_audio_results(text, voice, max_workers, audio_format, timeout, short_lead):
+            yield audio_data
+    
+    def convert_text_to_audio_data(self, text: str, voice: str = "alloy", max_workers: Optional[int] = None,
+                                   audio_format: str = "mp3") -> List[bytes]:
+        """Convert text to speech and return list of audio data as bytes"""
+        # Filter out failed chunks
+        audio_chunks = [
+            audio for audio in self.iter_audio_chunks(text, voice, max_workers, audio_format)
+            if audio is not None
+        ]
+        return audio_chunks
+    
+    def combine_audio_chunks(self, audio_chunks: List[bytes], audio_format: str = "mp3") -> bytes:
+        """Combine multiple audio chunks into a single seamless audio file"""
+        if not audio_chunks:
+            return b""
+        
+        if len(audio_chunks) == 1:
+            return audio_chunks[0]
+        
+        if audio_format not in COMBINABLE_FORMATS:
+            raise Exception(f"{audio_format.upper()} parts can't be combined into one playable file")
+        
+        if audio_format == "wav":
+            return self._combine_wav(audio_chunks)
+        
+        # For MP3 files, we can simply concatenate the bytes
+        # This works because MP3 is designed to be streamable
+        combined_audio = b"".join(audio_chunks)
+        return combined_audio
+    
+    @staticmethod
+    def _combine_wav(audio_chunks: List[bytes]) -> bytes:
+        """Merge WAV chunks into one file with a single RIFF header
+        
+        Streamed WAV responses may declare a placeholder data size, so the
+        frame count is left for the writer to fill in from the frames written.
+        """
+        output = io.BytesIO()
+        with wave.open(output, "wb") as writer:
+            for i, chunk in enumerate(audio_chunks):
+                with wave.open(io.BytesIO(chunk), "rb") as reader:
+                    params = reader.getparams()
+                    if i == 0:
+                        first = params
+                        writer.setparams(params._replace(nframes=0))
+                    elif (params.nchannels, params.sampwidth, params.framerate) != (
+                            first.nchannels, first.sampwidth, first.framerate):
+                        raise Exception(
+                            f"Cannot combine WAV parts: part {i + 1} is "
+                            f"{params.nchannels}ch/{params.sampwidth * 8}-bit/{params.framerate}Hz, "
+                            f"part 1 is {first.nchannels}ch/{first.sampwidth * 8}-bit/{first.framerate}Hz"
+                        )
+                    writer.writeframes(reader.readframes(reader.getnframes()))
+        return output.getvalue()
@@ -1,131 +1,48 @@
 import os
-import requests
-import json
-import io
-import threading
-import time
-import re
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from typing import List, Tuple
-from flask import Flask, render_template, request, jsonify, send_file, Response
-import tempfile
-import uuid
+from flask import Flask, Response, render_template, request, jsonify
 import base64
 from dotenv import load_dotenv
+from tts_client import MIME_TYPES, AzureTTSClient, ConversionTimeoutError
+
+try:
+    # Optional SIMD-accelerated base64 encoder that returns str directly
+    from pybase64 import b64encode_as_string
+except ImportError:
+    def b64encode_as_string(data: bytes) -> str:
+        """Base64-encode data to a str"""
+        return base64.b64encode(data).decode('ascii')
+
+try:
+    # Optional response compression for the base64-in-JSON audio payloads
+    from flask_compress import Compress
+except ImportError:
+    Compress = None
+
+try:
+    # Optional C JSON encoder for the large base64 audio responses
+    import orjson
+except ImportError:
+    orjson = None
+
+def audio_json_response(payload: dict):
+    """Serialize an audio payload, with orjson when it is installed"""
+    if orjson is not None:
+        return Response(orjson.dumps(payload), mimetype='application/json')
+    return jsonify(payload)
 
 # Load environment variables from .env file
 load_dotenv()
 
-class AzureTTSClient:
-    def __init__(self, endpoint: str, api_key: str):
-        """Initialize the Azure TTS client"""
-        self.endpoint = endpoint
-        self.api_key = api_key
-        self.headers = {
-            "Content-Type": "application/json",
-            "Authorization": f"Bearer {api_key}"
-        }
-        
-    def chunk_text(self, text: str, max_chars: int = 4000) -> List[str]:
-        """Split text into chunks that respect sentence boundaries"""
-        if len(text) <= max_chars:
-            return [text]
-        
-        chunks = []
-        current_chunk = ""
-        
-        # Split by sentences first
-        sentences = re.split(r'(?<=[.!?])\s+', text)
-        
-        for sentence in sentences:
-            # If a single sentence is too long, split by words
-            if len(sentence) > max_chars:
-                words = sentence.split()
-                temp_chunk = ""
-                
-                for word in words:
-                    if len(temp_chunk + " " + word) <= max_chars:
-                        temp_chunk += (" " + word) if temp_chunk else word
-                    else:
-                        if temp_chunk:
-                            chunks.append(temp_chunk.strip())
-                        temp_chunk = word
-                
-                if temp_chunk:
-                    if len(current_chunk + " " + temp_chunk) <= max_chars:
-                        current_chunk += (" " + temp_chunk) if current_chunk else temp_chunk
-                    else:
-                        if current_chunk:
-                            chunks.append(current_chunk.strip())
-                        current_chunk = temp_chunk
-            else:
-                # Check if adding this sentence exceeds the limit
-                if len(current_chunk + " " + sentence) <= max_chars:
-                    current_chunk += (" " + sentence) if current_chunk else sentence
-                else:
-                    if current_chunk:
-                        chunks.append(current_chunk.strip())
-                    current_chunk = sentence
-        
-        if current_chunk:
-            chunks.append(current_chunk.strip())
-        
-        return chunks
-    
-    def text_to_speech(self, text: str, voice: str = "alloy") -> bytes:
-        """Convert text to speech using Azure OpenAI TTS API"""
-        payload = {
-            "model": "gpt-4o-mini-tts",
-            "input": text,
-            "voice": voice
-        }
-        
-        try:
-            response = requests.post(
-                self.endpoint,
-                headers=self.headers,
-                json=payload,
-                timeout=30
-            )
-            response.raise_for_status()
-            return response.content
-        except requests.exceptions.RequestException as e:
-            raise Exception(f"TTS API request failed: {str(e)}")
-    
-    def convert_text_to_audio_data(self, text: str, voice: str = "alloy", max_workers: int = 3) -> List[bytes]:
-        """Convert text to speech and return list of audio data as bytes"""
-        chunks = self.chunk_text(text)
-        print(f"Text split into {len(chunks)} chunks")
-        
-        # Submit all chunks for processing in parallel
-        with ThreadPoolExecutor(max_workers=max_workers) as executor:
-            # Submit all chunks
-            future_to_index = {
-                executor.submit(self.text_to_speech, chunk, voice): i 
-                for i, chunk in enumerate(chunks)
-            }
-            
-            # Collect results in order
-            results = [None] * len(chunks)
-            
-            for future in as_completed(future_to_index):
-                index = future_to_index[future]
-                try:
-                    audio_data = future.result()
-                    results[index] = audio_data
-                    print(f"Chunk {index + 1}/{len(chunks)} processed")
-                except Exception as e:
-                    print(f"Error processing chunk {index + 1}: {e}")
-                    results[index] = None
-        
-        # Filter out None results
-        audio_chunks = [audio for audio in results if audio is not None]
-        return audio_chunks
-
 # Flask Web Application
 app = Flask(__name__)
 app.secret_key = 'your-secret-key-here'
 
+if Compress is not None:
+    # Only JSON: raw streamed audio is already compressed
+    app.config['COMPRESS_MIMETYPES'] = ['application/json']
+    app.config['COMPRESS_ALGORITHM'] = ['br', 'gzip']
+    Compress(app)
+
 # Initialize TTS client with environment variables
 azure_endpoint = os.getenv('AZURE_TTS_ENDPOINT')
 azure_api_key = os.getenv('AZURE_API_KEY')
@@ -134,6 +51,7 @@ tts_client = None
 if azure_endpoint and azure_api_key:
     try:
         tts_client = AzureTTSClient(azure_endpoint, azure_api_key)
+        tts_client.warm_up()
         print("✅ TTS Client initialized from environment variables")
     except Exception as e:
         print(f"❌ Failed to initialize TTS client: {e}")
@@ -158,52 +76,124 @@ def initialize_client():
         return jsonify({'error': 'Please provide both endpoint and API key'}), 400
     
     try:
+        if tts_client:
+            tts_client.close()
         tts_client = AzureTTSClient(endpoint, api_key)
+        tts_client.warm_up()
         return jsonify({'success': True, 'message': 'TTS Client initialized successfully'})
     except Exception as e:
         return jsonify({'error': f'Failed to initialize TTS client: {str(e)}'}), 500
 
-@app.route('/api/convert', methods=['POST'])
-def convert_text():
-    """Convert text to speech and return audio data as base64"""
-    global tts_client
+# Only back-to-back MP3 frames play through as one stream: WAV parts each
+# carry a header, and browsers stop chained Ogg after the first part
+STREAM_FORMATS = ('mp3',)
+
+def read_convert_request(formats):
+    """Read and validate a conversion request body
     
+    Returns ((text, voice, audio_format), None) on success, or
+    (None, error_response) for the route to return as-is.
+    """
     if not tts_client:
-        return jsonify({'error': 'TTS client not initialized'}), 400
+        return None, (jsonify({'error': 'TTS client not initialized'}), 400)
     
     data = request.get_json()
     text = data.get('text', '').strip()
     voice = data.get('voice', 'alloy')
+    audio_format = data.get('format', 'mp3')
     
     if not text:
-        return jsonify({'error': 'Please provide text to convert'}), 400
+        return None, (jsonify({'error': 'Please provide text to convert'}), 400)
+    
+    if audio_format not in formats:
+        supported = ', '.join(formats)
+        return None, (jsonify({'error': f'Unsupported audio format: {audio_format} (supported: {supported})'}), 400)
+    
+    return (text, voice, audio_format), None
+
+def conversion_failed_response(errors):
+    """Error response for a conversion where no part succeeded"""
+    if any(isinstance(error, ConversionTimeoutError) for error in errors):
+        return jsonify({'error': 'TTS conversion timed out'}), 408
+    return jsonify({'error': 'Failed to generate audio'}), 500
+
+@app.route('/api/convert', methods=['POST'])
+def convert_text():
+    """Convert text to speech and return audio data as base64"""
+    params, error_response = read_convert_request(MIME_TYPES)
+    if error_response:
+        return error_response
+    text, voice, audio_format = params
     
     try:
-        # Convert text to audio data
-        audio_chunks = tts_client.convert_text_to_audio_data(text, voice)
+        # Convert text to (audio, error) per part, in text order
+        results = list(tts_client.iter_audio_results(text, voice, audio_format=audio_format))
+        missing_chunks = [i for i, (audio_data, _) in enumerate(results) if audio_data is None]
         
-        if not audio_chunks:
-            return jsonify({'error': 'Failed to generate audio'}), 500
+        if len(missing_chunks) == len(results):
+            return conversion_failed_response(error for _, error in results)
         
-        # Convert audio chunks to base64 for web delivery
+        # Convert audio chunks to base64 for web delivery, keeping each part's position in the text
         audio_data_list = []
-        for i, audio_data in enumerate(audio_chunks):
-            audio_b64 = base64.b64encode(audio_data).decode('utf-8')
+        for i, (audio_data, _) in enumerate(results):
+            if audio_data is None:
+                continue
+            audio_b64 = b64encode_as_string(audio_data)
             audio_data_list.append({
                 'index': i,
                 'data': audio_b64,
-                'type': 'audio/mpeg'
+                'type': MIME_TYPES[audio_format]
             })
         
-        return jsonify({
+        return audio_json_response({
             'success': True, 
             'message': 'Audio conversion completed',
             'audio_chunks': audio_data_list,
-            'total_chunks': len(audio_chunks)
+            'total_chunks': len(results),
+            'missing_chunks': missing_chunks,
+            'partial': bool(missing_chunks)
         })
     except Exception as e:
         return jsonify({'error': f'TTS conversion failed: {str(e)}'}), 500
 
+@app.route('/api/convert/stream', methods=['POST'])
+def convert_text_stream():
+    """Convert text to speech and stream the raw audio as each part finishes
+    
+    Parts are written in order as soon as they and every earlier part are
+    done, so browsers can start playback early and no base64/JSON wrapping
+    is needed. The first part is synthesized before responding, so a failed
+    conversion still gets an error status; later failed parts are logged
+    and skipped.
+    """
+    params, error_response = read_convert_request(STREAM_FORMATS)
+    if error_response:
+        return error_response
+    text, voice, audio_format = params
+    
+    try:
+        # A short first part gets playback going sooner. No deadline: the client is
+        # already playing, and a part that is still downloading is better late than skipped
+        results = tts_client.iter_audio_results(text, voice, audio_format=audio_format,
+                                                timeout=None, short_lead=True)
+        first_audio, first_error = next(results)
+    except Exception as e:
+        return jsonify({'error': f'TTS conversion failed: {str(e)}'}), 500
+    
+    if first_audio is None:
+        results.close()
+        return conversion_failed_response([first_error])
+    
+    def generate():
+        yield first_audio
+        for i, (audio_data, error) in enumerate(results, start=2):
+            if audio_data is None:
+                app.logger.warning("Skipping part %d of streamed conversion: %s", i, error)
+                continue
+            yield audio_data
+    
+    return Response(generate(), mimetype=MIME_TYPES[audio_format])
+
 if __name__ == '__main__':
     # Create templates directory if it doesn't exist
     os.makedirs('templates', exist_ok=True)